@@ -6,14 +6,35 @@ Result analysis script for cryptographic algorithm experiments
 
 import os
 import sys
-import csv
 import argparse
-import statistics
-import glob
+import contextlib
+import functools
 import re
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-import matplotlib.pyplot as plt
+from typing import Callable, Optional
 import numpy as np
+import pandas as pd
+from joblib import Memory
+
+# Prefer pyarrow's multi-threaded CSV reader when it is installed
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# Parse this many files or fewer in-process, where pool startup would outweigh the work
+SERIAL_PARSE_LIMIT = 2
+
+# Regular expression to extract operation rates from energy logs
+RATE_REGEX = re.compile(r'STAT: (\d+)s - Rate:\s+(\d+) ops/sec')
+
+# Regular expression to extract algorithm, bit size and timestamp from log filenames
+FILENAME_REGEX = re.compile(r'([a-z_]+)_(\d+)bits_(\d{8}_\d{6})\.log')
 
 def parse_args():
     """Parse command line arguments"""
@@ -26,235 +47,310 @@ def parse_args():
                         help='Output directory for analysis results')
     parser.add_argument('--plot', action='store_true',
                         help='Generate plots')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Reparse every result file instead of using the parse cache')
     return parser.parse_args()
 
-def analyze_timing_results(directory, output_dir):
-    """Analyze timing experiment results"""
-    if not directory:
-        directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                                 'results', 'timing')
+def get_memory(use_cache=True):
+    """Return the joblib Memory caching per-file parses, keyed by path, mtime and size"""
+    if not use_cache:
+        return Memory(None, verbose=0)
+    return Memory(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache'),
+                  verbose=0)
+
+def _parse_timing_csv(path, mtime, size):
+    """Parse a single timing CSV file"""
+    df = pd.read_csv(path, usecols=['algorithm', 'bits', 'time_ns'],
+                     dtype={'bits': 'int32', 'time_ns': 'float64'},
+                     engine=CSV_ENGINE)
     
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    # Shrink bits to the smallest integer type its values fit in; astype would wrap
+    df['bits'] = pd.to_numeric(df['bits'], downcast='integer')
+    return df
+
+def _parse_energy_log(path, mtime, size):
+    """Extract the operation rates from a single energy log file as uint64 bytes"""
+    with open(path, 'r') as f:
+        text = f.read()
+    return array('Q', (int(rate) for seconds, rate in RATE_REGEX.findall(text))).tobytes()
+
+def group_stats(values, offsets, counts):
+    """Compute min, max and mean of each non-empty group values[offsets[i]:offsets[i] + counts[i]]"""
+    if not len(counts):
+        return np.empty(0), np.empty(0), np.empty(0)
+    mins = np.minimum.reduceat(values, offsets)
+    maxs = np.maximum.reduceat(values, offsets)
+    means = np.add.reduceat(values, offsets) / counts
+    return mins, maxs, means
+
+@dataclass
+class AnalysisSpec:
+    """Describes how one type of experiment results is found, parsed and summarized"""
+    name: str
+    label: str
+    extension: str
+    fieldnames: list
+    # (path, mtime, size) -> parsed file, run in worker processes
+    parse: Callable
+    # (parsed files, metadata) -> (summary DataFrame to write, stats DataFrame to return)
+    aggregate: Callable
+    plot: Callable
+    # filename -> metadata, or None to skip the file; all files are kept if unset
+    describe: Optional[Callable] = None
+
+def describe_energy_log(filename):
+    """Extract (algorithm, bits, timestamp) from an energy log filename"""
+    match = FILENAME_REGEX.match(filename)
+    if not match:
+        return None
     
-    # Find all CSV files in the directory
-    csv_files = glob.glob(os.path.join(directory, '*.csv'))
+    algorithm, bits_str, timestamp = match.groups()
+    return algorithm, int(bits_str), timestamp
+
+def aggregate_timing_results(frames, metadata):
+    """Summarize timing samples per algorithm and bit size"""
+    results = pd.concat(frames, ignore_index=True)
     
-    if not csv_files:
-        print(f"No CSV files found in {directory}")
-        return
+    # Concatenating per-file categoricals would fall back to object, so convert here
+    results['algorithm'] = results['algorithm'].astype('category')
     
-    print(f"Found {len(csv_files)} CSV files in {directory}")
+    # Calculate statistics
+    stats = (results.groupby(['algorithm', 'bits'], observed=True)['time_ns']
+             .agg(['min', 'max', 'mean', 'median', 'std', 'count'])
+             .reset_index()
+             .rename(columns={'std': 'stdev', 'count': 'samples'}))
+    # Reuse the aggregated stdev and mean for CV instead of recomputing them
+    multiple = stats['samples'] > 1
+    stats['stdev'] = stats['stdev'].where(multiple, 0)
+    stats['cv'] = np.where(multiple, stats['stdev'] / stats['mean'].replace(0, np.nan), 0.0)
+    stats['cv'] = stats['cv'].fillna(0.0)
     
-    # Dictionary to store results by algorithm and bit size
-    results = {}
+    # Single-sample groups have always reported stdev and cv as a plain 0
+    summary = stats.copy()
+    for column in ['stdev', 'cv']:
+        summary[column] = summary[column].astype(object).where(multiple, 0)
     
-    # Read all CSV files
-    for csv_file in csv_files:
-        filename = os.path.basename(csv_file)
-        print(f"Processing {filename}...")
-        
-        with open(csv_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                algorithm = row['algorithm']
-                bits = int(row['bits'])
-                time = float(row['time_ns'])
-                
-                if algorithm not in results:
-                    results[algorithm] = {}
-                
-                if bits not in results[algorithm]:
-                    results[algorithm][bits] = []
-                
-                results[algorithm][bits].append(time)
+    return summary, stats
+
+def aggregate_energy_results(all_rates, experiments):
+    """Summarize per-experiment average rates per algorithm and bit size"""
+    # Dictionary to store results by (algorithm, bit size)
+    results = defaultdict(list)
     
-    # Calculate statistics
-    stats = {}
-    for algorithm in results:
-        stats[algorithm] = {}
-        for bits in results[algorithm]:
-            times = results[algorithm][bits]
-            stats[algorithm][bits] = {
-                'min': min(times),
-                'max': max(times),
-                'mean': statistics.mean(times),
-                'median': statistics.median(times),
-                'stdev': statistics.stdev(times) if len(times) > 1 else 0,
-                'cv': statistics.stdev(times) / statistics.mean(times) if len(times) > 1 else 0,
-                'samples': len(times)
-            }
+    for (algorithm, bits, timestamp), rates in zip(experiments, all_rates):
+        if rates:
+            # Add this experiment's average rate to results
+            rates = np.frombuffer(rates, dtype=np.uint64)
+            results[(algorithm, bits)].append({
+                'timestamp': timestamp,
+                'avg_rate': rates.mean(),
+                'min_rate': rates.min(),
+                'max_rate': rates.max(),
+                'rates': rates
+            })
     
-    # Write summary to CSV
-    summary_file = os.path.join(output_dir, 'timing_summary.csv')
-    with open(summary_file, 'w', newline='') as f:
-        fieldnames = ['algorithm', 'bits', 'min', 'max', 'mean', 'median', 'stdev', 'cv', 'samples']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for algorithm in sorted(stats.keys()):
-            for bits in sorted(stats[algorithm].keys()):
-                writer.writerow({
-                    'algorithm': algorithm,
-                    'bits': bits,
-                    **{k: stats[algorithm][bits][k] for k in ['min', 'max', 'mean', 'median', 'stdev', 'cv', 'samples']}
-                })
+    # Flatten the average rates of all non-empty groups into one array
+    keys = list(results)
+    counts = np.array([len(results[key]) for key in keys], dtype=np.int64)
+    avg_rates = np.fromiter((exp['avg_rate'] for key in keys for exp in results[key]),
+                            dtype=np.float64, count=int(counts.sum()))
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
     
-    print(f"Timing summary written to {summary_file}")
+    # Calculate statistics
+    min_rates, max_rates, mean_rates = group_stats(avg_rates, offsets, counts)
+    summary = pd.DataFrame({
+        'algorithm': [algorithm for algorithm, bits in keys],
+        'bits': np.array([bits for algorithm, bits in keys], dtype=np.int64),
+        'min_rate': min_rates,
+        'max_rate': max_rates,
+        'mean_rate': mean_rates,
+        'experiments': counts
+    })
     
-    return stats
+    return summary, summary
 
-def analyze_energy_results(directory, output_dir):
-    """Analyze energy experiment results"""
+def run_analysis(spec, directory, output_dir, use_cache=True, executor=None):
+    """Find, parse and summarize the result files described by spec"""
     if not directory:
         directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                                 'results', 'energy')
+                                 'results', spec.name)
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Find all log files in the directory
-    log_files = glob.glob(os.path.join(directory, '*.log'))
+    # Find all result files in the directory; a missing directory has none
+    files = []
+    if os.path.isdir(directory):
+        files = [entry for entry in os.scandir(directory)
+                 if entry.name.endswith(spec.extension) and entry.is_file()]
     
-    if not log_files:
-        print(f"No log files found in {directory}")
+    if not files:
+        print(f"No {spec.label} files found in {directory}")
         return
     
-    print(f"Found {len(log_files)} log files in {directory}")
+    print(f"Found {len(files)} {spec.label} files in {directory}")
     
-    # Dictionary to store results by algorithm and bit size
-    results = {}
+    parse = get_memory(use_cache).cache(spec.parse)
     
-    # Regular expression to extract operation rates
-    rate_regex = re.compile(r'STAT: (\d+)s - Rate:\s+(\d+) ops/sec')
-    
-    # Read all log files
-    for log_file in log_files:
-        filename = os.path.basename(log_file)
-        print(f"Processing {filename}...")
-        
-        # Extract algorithm and bit size from filename
-        match = re.match(r'([a-z_]+)_(\d+)bits_(\d{8}_\d{6})\.log', filename)
-        if not match:
-            print(f"  Skipping {filename}: does not match expected format")
-            continue
-        
-        algorithm, bits_str, timestamp = match.groups()
-        bits = int(bits_str)
-        
-        # Initialize dictionary entries
-        if algorithm not in results:
-            results[algorithm] = {}
+    metadata = []
+    paths, mtimes, sizes = [], [], []
+    for entry in files:
+        print(f"Processing {entry.name}...")
         
-        if bits not in results[algorithm]:
-            results[algorithm][bits] = []
+        if spec.describe is not None:
+            meta = spec.describe(entry.name)
+            if meta is None:
+                print(f"  Skipping {entry.name}: does not match expected format")
+                continue
+        else:
+            meta = None
         
-        # Extract operation rates from log file
-        rates = []
-        with open(log_file, 'r') as f:
-            for line in f:
-                match = rate_regex.search(line)
-                if match:
-                    seconds, rate = match.groups()
-                    rates.append(int(rate))
-        
-        if rates:
-            # Add this experiment's average rate to results
-            avg_rate = sum(rates) / len(rates)
-            results[algorithm][bits].append({
-                'timestamp': timestamp,
-                'avg_rate': avg_rate,
-                'min_rate': min(rates),
-                'max_rate': max(rates),
-                'rates': rates
-            })
+        st = entry.stat()
+        metadata.append(meta)
+        paths.append(entry.path)
+        mtimes.append(st.st_mtime_ns)
+        sizes.append(st.st_size)
     
-    # Calculate statistics
-    stats = {}
-    for algorithm in results:
-        stats[algorithm] = {}
-        for bits in results[algorithm]:
-            experiments = results[algorithm][bits]
-            if experiments:
-                avg_rates = [exp['avg_rate'] for exp in experiments]
-                stats[algorithm][bits] = {
-                    'min_rate': min(avg_rates),
-                    'max_rate': max(avg_rates),
-                    'mean_rate': statistics.mean(avg_rates) if avg_rates else 0,
-                    'experiments': len(experiments)
-                }
+    # Parse all files, in parallel unless there are only a few
+    if len(paths) <= SERIAL_PARSE_LIMIT:
+        parsed = list(map(parse, paths, mtimes, sizes))
+    else:
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            parsed = list(executor.map(parse, paths, mtimes, sizes, chunksize=chunksize))
+    
+    summary, stats = spec.aggregate(parsed, metadata)
     
     # Write summary to CSV
-    summary_file = os.path.join(output_dir, 'energy_summary.csv')
-    with open(summary_file, 'w', newline='') as f:
-        fieldnames = ['algorithm', 'bits', 'min_rate', 'max_rate', 'mean_rate', 'experiments']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for algorithm in sorted(stats.keys()):
-            for bits in sorted(stats[algorithm].keys()):
-                writer.writerow({
-                    'algorithm': algorithm,
-                    'bits': bits,
-                    **stats[algorithm][bits]
-                })
+    summary_file = os.path.join(output_dir, f'{spec.name}_summary.csv')
+    summary = summary.sort_values(['algorithm', 'bits'], kind='mergesort', ignore_index=True)
+    summary[spec.fieldnames].to_csv(summary_file, index=False, lineterminator='\r\n')
     
-    print(f"Energy summary written to {summary_file}")
+    print(f"{spec.name.capitalize()} summary written to {summary_file}")
     
     return stats
 
+def analyze_timing_results(directory, output_dir, use_cache=True, executor=None):
+    """Analyze timing experiment results"""
+    return run_analysis(ANALYSES['timing'], directory, output_dir, use_cache, executor)
+
+def analyze_energy_results(directory, output_dir, use_cache=True, executor=None):
+    """Analyze energy experiment results"""
+    return run_analysis(ANALYSES['energy'], directory, output_dir, use_cache, executor)
+
+@functools.lru_cache(maxsize=None)
+def get_pyplot():
+    """Import pyplot on first use, so runs without --plot skip matplotlib"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    # Plots are only written to files, so simplify paths aggressively
+    plt.rcParams['path.simplify'] = True
+    plt.rcParams['path.simplify_threshold'] = 1.0
+    return plt
+
+def plot_series(ax, labels, xs, ys):
+    """Draw one marked line per series on log-log axes with a single collection"""
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    
+    colors = [f'C{i % 10}' for i in range(len(labels))]
+    
+    ax.set_xscale('log', base=2)
+    ax.set_yscale('log', base=10)
+    
+    segments = [np.column_stack((x, y)) for x, y in zip(xs, ys)]
+    ax.add_collection(LineCollection(segments, colors=colors))
+    ax.scatter(np.concatenate(xs), np.concatenate(ys),
+               c=[color for color, x in zip(colors, xs) for _ in x], zorder=3)
+    ax.autoscale_view()
+    
+    handles = [Line2D([], [], color=color, marker='o', label=label)
+               for color, label in zip(colors, labels)]
+    ax.legend(handles=handles)
+
 def generate_timing_plots(stats, output_dir):
     """Generate plots for timing results"""
-    if not stats:
+    if stats is None or stats.empty:
         return
     
-    plt.figure(figsize=(12, 8))
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(12, 8))
     
     # Plot mean time vs bit size for each algorithm
-    for algorithm in stats:
-        x = sorted(stats[algorithm].keys())
-        y = [stats[algorithm][bits]['mean'] for bits in x]
-        
-        plt.plot(x, y, marker='o', label=algorithm)
+    labels, xs, ys = [], [], []
+    ordered = stats.sort_values(['algorithm', 'bits'], kind='mergesort')
+    for algorithm, group in ordered.groupby('algorithm', observed=True):
+        labels.append(algorithm)
+        xs.append(group['bits'].to_numpy(dtype=np.float64))
+        ys.append(group['mean'].to_numpy(dtype=np.float64))
+    
+    plot_series(ax, labels, xs, ys)
     
-    plt.title('Mean Execution Time by Bit Size')
-    plt.xlabel('Bit Size')
-    plt.ylabel('Time (ns)')
-    plt.xscale('log', base=2)
-    plt.yscale('log', base=10)
-    plt.grid(True, which='both', linestyle='--', alpha=0.5)
-    plt.legend()
+    ax.set_title('Mean Execution Time by Bit Size')
+    ax.set_xlabel('Bit Size')
+    ax.set_ylabel('Time (ns)')
+    ax.grid(True, which='both', linestyle='--', alpha=0.5)
     
     plot_file = os.path.join(output_dir, 'timing_plot.png')
-    plt.savefig(plot_file)
+    fig.savefig(plot_file, dpi=100)
+    plt.close(fig)
     print(f"Timing plot saved to {plot_file}")
 
 def generate_energy_plots(stats, output_dir):
     """Generate plots for energy results"""
-    if not stats:
+    if stats is None or stats.empty:
         return
     
-    plt.figure(figsize=(12, 8))
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(12, 8))
     
     # Plot mean operation rate vs bit size for each algorithm
-    for algorithm in stats:
-        x = sorted(stats[algorithm].keys())
-        y = [stats[algorithm][bits]['mean_rate'] for bits in x]
-        
-        plt.plot(x, y, marker='o', label=algorithm)
+    labels, xs, ys = [], [], []
+    ordered = stats.sort_values(['algorithm', 'bits'], kind='mergesort')
+    for algorithm, group in ordered.groupby('algorithm', observed=True):
+        labels.append(algorithm)
+        xs.append(group['bits'].to_numpy(dtype=np.float64))
+        ys.append(group['mean_rate'].to_numpy(dtype=np.float64))
+    
+    plot_series(ax, labels, xs, ys)
     
-    plt.title('Mean Operation Rate by Bit Size')
-    plt.xlabel('Bit Size')
-    plt.ylabel('Operations per Second')
-    plt.xscale('log', base=2)
-    plt.yscale('log', base=10)
-    plt.grid(True, which='both', linestyle='--', alpha=0.5)
-    plt.legend()
+    ax.set_title('Mean Operation Rate by Bit Size')
+    ax.set_xlabel('Bit Size')
+    ax.set_ylabel('Operations per Second')
+    ax.grid(True, which='both', linestyle='--', alpha=0.5)
     
     plot_file = os.path.join(output_dir, 'energy_plot.png')
-    plt.savefig(plot_file)
+    fig.savefig(plot_file, dpi=100)
+    plt.close(fig)
     print(f"Energy plot saved to {plot_file}")
 
+ANALYSES = {
+    'timing': AnalysisSpec(
+        name='timing',
+        label='CSV',
+        extension='.csv',
+        fieldnames=['algorithm', 'bits', 'min', 'max', 'mean', 'median', 'stdev', 'cv', 'samples'],
+        parse=_parse_timing_csv,
+        aggregate=aggregate_timing_results,
+        plot=generate_timing_plots,
+    ),
+    'energy': AnalysisSpec(
+        name='energy',
+        label='log',
+        extension='.log',
+        fieldnames=['algorithm', 'bits', 'min_rate', 'max_rate', 'mean_rate', 'experiments'],
+        parse=_parse_energy_log,
+        aggregate=aggregate_energy_results,
+        plot=generate_energy_plots,
+        describe=describe_energy_log,
+    ),
+}
+
 def main():
     args = parse_args()
     
@@ -263,14 +359,11 @@ def main():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         args.output = f'analysis_{args.type}_{timestamp}'
     
-    if args.type == 'timing':
-        stats = analyze_timing_results(args.dir, args.output)
-        if args.plot:
-            generate_timing_plots(stats, args.output)
-    else:  # energy
-        stats = analyze_energy_results(args.dir, args.output)
-        if args.plot:
-            generate_energy_plots(stats, args.output)
+    spec = ANALYSES[args.type]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        stats = run_analysis(spec, args.dir, args.output, not args.no_cache, executor)
+    if args.plot:
+        spec.plot(stats, args.output)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()